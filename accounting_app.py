@@ -1,126 +1,503 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime
-import plotly.express as px
 import numpy as np
 import io
+import os
+import hashlib
+import json
+import bisect
+import threading
+import time
+import uuid
+from types import SimpleNamespace
+from array import array
+from enum import IntEnum
+from concurrent.futures import ThreadPoolExecutor
+import pyarrow as pa
+import pyarrow.parquet as pq
+from streamlit.runtime.uploaded_file_manager import UploadedFile
 
 # --- Configuration and Initialization ---
 st.set_page_config(layout="wide", page_title="Simple Accounting Package")
 
-# Initialize session state for data storage
-if 'receivables' not in st.session_state:
-    st.session_state.receivables = pd.DataFrame(columns=['Date', 'Customer', 'Type', 'Amount', 'Description']).astype({
-        'Date': 'datetime64[ns]',
-        'Customer': str,
-        'Type': str,
-        'Amount': float,
-        'Description': str
-    })
-if 'payables' not in st.session_state:
-    st.session_state.payables = pd.DataFrame(columns=['Date', 'Vendor/Category', 'Amount', 'Description']).astype({
-        'Date': 'datetime64[ns]',
-        'Vendor/Category': str,
-        'Amount': float,
-        'Description': str
-    })
-if 'inventory' not in st.session_state:
-    st.session_state.inventory = pd.DataFrame(columns=['Item', 'Quantity', 'Unit Cost', 'Selling Price', 'Last Updated']).astype({
-        'Item': str,
-        'Quantity': int,
-        'Unit Cost': float,
-        'Selling Price': float,
-        'Last Updated': str
-    })
-if 'fixed_assets' not in st.session_state:
-    st.session_state.fixed_assets = pd.DataFrame(columns=['Asset Tag', 'Asset Name', 'Category', 'Location', 'Acquisition Date', 'Cost', 'Salvage Value', 'Useful Life (Years)', 'Accumulated Depreciation']).astype({
-        'Asset Tag': str,
-        'Asset Name': str,
-        'Category': str,
-        'Location': str,
-        'Acquisition Date': 'datetime64[ns]',
-        'Cost': float,
-        'Salvage Value': float,
-        'Useful Life (Years)': int,
-        'Accumulated Depreciation': float
-    })
-
-# Initialize a simplified General Ledger (GL)
-if 'general_ledger' not in st.session_state:
-    st.session_state.general_ledger = pd.DataFrame(columns=['Date', 'Account', 'Debit', 'Credit', 'Description']).astype({
-        'Date': 'datetime64[ns]',
-        'Account': str,
-        'Debit': float,
-        'Credit': float,
-        'Description': str
-    })
+# Column layouts for the record stores
+RECEIVABLE_COLUMNS = ['Date', 'Customer', 'Type', 'Amount', 'Description']
+PAYABLE_COLUMNS = ['Date', 'Vendor/Category', 'Amount', 'Description']
+# Low-cardinality record columns, held as categoricals in the record DataFrames
+RECORD_CATEGORY_COLUMNS = ['Type', 'Vendor/Category']
+INVENTORY_COLUMNS = ['Item', 'Quantity', 'Unit Cost', 'Selling Price', 'Last Updated']
+FIXED_ASSET_DTYPES = {
+    'Asset Tag': str,
+    'Asset Name': str,
+    'Category': str,
+    'Location': str,
+    'Acquisition Date': 'datetime64[ns]',
+    'Cost': float,
+    'Salvage Value': float,
+    'Useful Life (Years)': int,
+    'Accumulated Depreciation': float
+}
+
+# Dates are stored in the GL as days since the Unix epoch
+EPOCH_ORDINAL = datetime(1970, 1, 1).toordinal()
+
+# Records are saved as Parquet files in this directory and restored when a session starts
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'accounting_data')
+# The GL is append-only, so each save writes only the new entries as a part file; the
+# parts are folded into a single base file on restore and once GL_COMPACT_PARTS pile up
+GL_DIR = os.path.join(DATA_DIR, 'gl')
+GL_BASE = 'base'
+GL_BASE_PARTS_KEY = 'compacted_parts'
+GL_COMPACT_PARTS = 64
+GL_SCHEMA = pa.schema([
+    ('date', pa.date32()),
+    ('account', pa.string()),
+    ('debit', pa.float64()),
+    ('credit', pa.float64()),
+    ('kind', pa.int8()),
+    ('desc', pa.string())
+])
+
+class TxnKind(IntEnum):
+    """Category of the business transaction a GL entry belongs to."""
+    CASH_SALE = 0
+    CREDIT_SALE = 1
+    EXPENSE_PAYMENT = 2
+    ASSET_ACQUISITION = 3
+    DEPRECIATION = 4
+    COGS = 5
+
+# --- Ledger Store ---
+# The records live in one store shared by every browser session of the app, so all
+# sessions work on the same books and the files in DATA_DIR have a single writer.
+# Code that reads or changes the store holds its lock: the page functions take it around
+# record changes and GL posts, and the frame and report accessors take it themselves (the
+# lock is re-entrant). Uploads, parsing and charts run outside it.
+
+@st.cache_resource(show_spinner=False)
+def ledger_store():
+    """Returns the ledger store shared by all sessions."""
+    return SimpleNamespace(
+        lock=threading.RLock(),
+        restored=False,
+        # Records are kept as plain lists of dicts so that adding one is an O(1) append;
+        # DataFrames are only built when a page needs to display or aggregate them.
+        # Receivables and payables are kept sorted by date as they are inserted.
+        receivable_rows=[],
+        payable_rows=[],
+        # Inventory records are keyed by item name for O(1) lookup on the POS path; the
+        # version counter is bumped on every change so the display frame can be cached.
+        inventory_by_name={},
+        inventory_version=0,
+        # Fixed assets are appended as records; depreciation updates them in place and
+        # bumps the version counter that keys the cached display frame.
+        fixed_asset_rows=[],
+        fixed_assets_version=0,
+        # A simplified General Ledger (GL), stored column-wise: one typed array per
+        # field, with account names dictionary-encoded as integer codes (account_codes
+        # maps name -> code). Debits and credits are whole cents, so totals and balance
+        # checks are exact.
+        gl={
+            'date': array('q'),
+            'account_code': array('i'),
+            'debit': array('q'),
+            'credit': array('q'),
+            'kind': array('b'),
+            'desc': []
+        },
+        account_codes={},
+        # Running [debit, credit] totals in cents per account, kept up to date as entries are posted
+        account_totals={},
+        # Years for which annual depreciation has been posted
+        depreciated_years=set(),
+        gl_digest='',
+        # Number of GL entries already written to disk, and the part files written since
+        # the GL was last compacted
+        gl_saved_rows=0,
+        gl_parts=[],
+        # Names of the record stores changed since they were last saved
+        dirty=set(),
+        # Messages for saved files that could not be loaded
+        load_errors=[]
+    )
+
+store = ledger_store()
+
+# DataFrames materialized from the append-only stores, keyed by store name
+if 'frame_cache' not in st.session_state:
+    st.session_state.frame_cache = {}
 
 # Initialize for uploaded financial statements
 if 'uploaded_is' not in st.session_state:
     st.session_state.uploaded_is = None
 if 'uploaded_bs' not in st.session_state:
     st.session_state.uploaded_bs = None
+# Amount totals per Item for the uploaded statements, aggregated once per upload
+if 'is_totals' not in st.session_state:
+    st.session_state.is_totals = None
+if 'bs_totals' not in st.session_state:
+    st.session_state.bs_totals = None
+
+# --- Persistence ---
+def _data_path(name):
+    return os.path.join(DATA_DIR, f"{name}.parquet")
+
+def _write_table(name, table):
+    """Writes a table to the data directory, replacing the previous file atomically."""
+    path = _data_path(name)
+    pq.write_table(table, path + '.tmp')
+    os.replace(path + '.tmp', path)
+
+def _read_table(path, **kwargs):
+    """Reads a saved table, moving the file aside and recording the error if it cannot be read."""
+    try:
+        return pq.read_table(path, **kwargs)
+    except Exception as e:
+        # Keep the unreadable file for inspection, out of the way of later saves and restores
+        aside = f"{path}.unreadable-{time.strftime('%Y%m%d%H%M%S')}"
+        os.replace(path, aside)
+        store.load_errors.append(f"Could not load {os.path.relpath(path, DATA_DIR)} ({e}); it was moved to {os.path.basename(aside)}.")
+        return None
+
+def _gl_table(start, end, metadata=None):
+    """Builds a table of GL entries start..end, with amounts in dollars."""
+    gl = store.gl
+    account_names = np.array(list(store.account_codes), dtype=object)
+    # Slicing copies the GL arrays; a zero-copy view would stop them from growing
+    return pa.table({
+        'date': pa.array(np.array(gl['date'][start:end], dtype=np.int32), type=pa.date32()),
+        'account': account_names[np.array(gl['account_code'][start:end], dtype=np.intp)],
+        'debit': np.array(gl['debit'][start:end]) / 100,
+        'credit': np.array(gl['credit'][start:end]) / 100,
+        'kind': np.array(gl['kind'][start:end]),
+        'desc': gl['desc'][start:end]
+    }, schema=GL_SCHEMA.with_metadata(metadata))
+
+def _compact_gl():
+    """Rewrites the whole GL as the base file and deletes the part files folded into it."""
+    os.makedirs(GL_DIR, exist_ok=True)
+    # The base lists the parts it includes, so a restore that finds them again (if deleting
+    # them below was interrupted) knows to skip them
+    table = _gl_table(0, len(store.gl['desc']), {GL_BASE_PARTS_KEY: json.dumps(store.gl_parts)})
+    _write_table(os.path.join('gl', GL_BASE), table)
+    for part in store.gl_parts:
+        os.remove(os.path.join(GL_DIR, part))
+    store.gl_parts = []
+
+def _append_gl_part():
+    """Writes the GL entries posted since the last save to a new part file."""
+    start, end = store.gl_saved_rows, len(store.gl['desc'])
+    if start == end:
+        return
+    os.makedirs(GL_DIR, exist_ok=True)
+    # Parts are named by their write time, so sorting the names restores posting order; the
+    # random suffix keeps a name from ever being reused
+    name = f"part-{time.time_ns():020d}-{uuid.uuid4().hex[:8]}"
+    _write_table(os.path.join('gl', name), _gl_table(start, end))
+    store.gl_parts.append(f"{name}.parquet")
+    store.gl_saved_rows = end
+    if len(store.gl_parts) >= GL_COMPACT_PARTS:
+        _compact_gl()
+
+# Rows to save for each record store, built only when that store has changed
+RECORD_STORE_ROWS = {
+    'receivables': lambda: store.receivable_rows,
+    'payables': lambda: store.payable_rows,
+    'inventory': lambda: [{'Item': item, **record} for item, record in store.inventory_by_name.items()],
+    'fixed_assets': lambda: store.fixed_asset_rows,
+    'depreciated_years': lambda: [{'Year': year} for year in sorted(store.depreciated_years)]
+}
+
+def save_state():
+    """Saves new GL entries and the record stores changed since the last save."""
+    os.makedirs(DATA_DIR, exist_ok=True)
+    _append_gl_part()
+    for name in store.dirty:
+        rows = RECORD_STORE_ROWS[name]()
+        if rows:
+            _write_table(name, pa.Table.from_pylist(rows))
+    store.dirty.clear()
+
+def _restore_gl():
+    """Loads the saved GL, compacts it into the base file and rebuilds the account codes, totals and digest."""
+    base_path = _data_path(os.path.join('gl', GL_BASE))
+    tables, included_parts = [], set()
+    if os.path.exists(base_path):
+        base = _read_table(base_path)
+        if base is not None:
+            included_parts = set(json.loads((base.schema.metadata or {}).get(GL_BASE_PARTS_KEY.encode(), b'[]')))
+            tables.append(base.replace_schema_metadata(None).cast(GL_SCHEMA))
+    for name in sorted(os.listdir(GL_DIR)):
+        if not (name.startswith('part-') and name.endswith('.parquet')):
+            continue
+        if name in included_parts:
+            # Already in the base; left behind by an interrupted compaction
+            os.remove(os.path.join(GL_DIR, name))
+            continue
+        part = _read_table(os.path.join(GL_DIR, name), schema=GL_SCHEMA)
+        if part is not None:
+            tables.append(part)
+            store.gl_parts.append(name)
+    if not tables:
+        return
+    table = pa.concat_tables(tables)
+    account = table.column('account').combine_chunks().dictionary_encode()
+    account_names = account.dictionary.to_pylist()
+    codes = account.indices.to_numpy().astype(np.intc)
+    # Amounts are saved in dollars and held in cents
+    debit = np.rint(table.column('debit').to_numpy() * 100).astype(np.int64)
+    credit = np.rint(table.column('credit').to_numpy() * 100).astype(np.int64)
+
+    gl = store.gl
+    gl['date'].frombytes(table.column('date').cast(pa.int32()).to_numpy().astype(np.int64).tobytes())
+    gl['account_code'].frombytes(codes.tobytes())
+    gl['debit'].frombytes(debit.tobytes())
+    gl['credit'].frombytes(credit.tobytes())
+    gl['kind'].frombytes(table.column('kind').to_numpy().tobytes())
+    gl['desc'].extend(table.column('desc').to_pylist())
+
+    store.account_codes = {account: code for code, account in enumerate(account_names)}
+    debit_sums = np.zeros(len(account_names), dtype=np.int64)
+    credit_sums = np.zeros(len(account_names), dtype=np.int64)
+    np.add.at(debit_sums, codes, debit)
+    np.add.at(credit_sums, codes, credit)
+    store.account_totals = {
+        account: [debit_total, credit_total]
+        for account, debit_total, credit_total in zip(account_names, debit_sums.tolist(), credit_sums.tolist())
+    }
+    store.gl_saved_rows = len(gl['desc'])
+    # Fold the parts into the base, so later restores read a single file
+    if store.gl_parts:
+        _compact_gl()
+    with open(base_path, 'rb') as f:
+        store.gl_digest = hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+
+def restore_state():
+    """Loads the records saved by an earlier run of the app, if any."""
+    if os.path.isdir(GL_DIR):
+        _restore_gl()
+    # Each file is read on its own, so one unreadable file does not keep the others from loading
+    for name in RECORD_STORE_ROWS:
+        if not os.path.exists(_data_path(name)):
+            continue
+        table = _read_table(_data_path(name))
+        if table is None:
+            continue
+        if name == 'receivables':
+            store.receivable_rows = table.to_pylist()
+        elif name == 'payables':
+            store.payable_rows = table.to_pylist()
+        elif name == 'inventory':
+            store.inventory_by_name = {record.pop('Item'): record for record in table.to_pylist()}
+        elif name == 'fixed_assets':
+            store.fixed_asset_rows = table.to_pylist()
+        else:
+            store.depreciated_years = set(table.column('Year').to_pylist())
 
-# --- Sidebar Navigation ---
-st.sidebar.title("Navigation")
-page = st.sidebar.radio("Go to", ["Daily Records (Receivables & Payables)", "Inventory Management", "Fixed Asset Register", "Point of Sale (POS)", "Financial Statements", "Analytics"])
+with store.lock:
+    if not store.restored:
+        store.restored = True
+        restore_state()
 
 # --- Helper Functions ---
-def post_to_gl(date, account, debit, credit, description):
-    """Posts a transaction to the simplified General Ledger."""
-    new_gl_entry = pd.DataFrame([{
-        'Date': date,
-        'Account': account,
-        'Debit': debit,
-        'Credit': credit,
-        'Description': description
-    }])
-    new_gl_entry = new_gl_entry.astype(st.session_state.general_ledger.dtypes)
-    st.session_state.general_ledger = pd.concat([st.session_state.general_ledger, new_gl_entry], ignore_index=True)
+def col_map(df, key='Category', value='Amount'):
+    """Maps each key column value of a report to its value column, for O(1) line lookups."""
+    return dict(zip(df[key], df[value]))
+
+def amount_columns(*columns):
+    """Returns a column_config that shows the given columns with thousand separators and two decimals."""
+    return {column: st.column_config.NumberColumn(format='%,.2f') for column in columns}
+
+def _records_frame(rows, columns):
+    """Builds a DataFrame from a list of record dicts."""
+    df = pd.DataFrame(rows, columns=columns)
+    if 'Date' in df.columns:
+        df['Date'] = pd.to_datetime(df['Date'])
+    for column in RECORD_CATEGORY_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype('category')
+    return df
+
+def _cached_frame(key, version, build):
+    """Returns the DataFrame for a store, calling build() only when its version changed.
+
+    Append-only stores use their row count as the version.
+    """
+    cached = st.session_state.frame_cache.get(key)
+    if cached is None or cached[0] != version:
+        cached = (version, build())
+        st.session_state.frame_cache[key] = cached
+    return cached[1]
+
+def _gl_frame(gl, account_codes):
+    """Decodes the GL column arrays into a DataFrame, latest date first.
+
+    Indexing with the sort order copies the arrays, so they can keep growing.
+    """
+    account_names = np.array(list(account_codes), dtype=object)
+    dates = np.frombuffer(gl['date'], dtype=np.int64)
+    # Entries on the same date stay newest first
+    order = np.lexsort((np.arange(len(dates)), dates))[::-1]
+    return pd.DataFrame({
+        'Date': dates[order].astype('datetime64[D]'),
+        'Account': account_names[np.frombuffer(gl['account_code'], dtype=np.intc)[order]],
+        'Debit': np.frombuffer(gl['debit'], dtype=np.int64)[order] / 100,
+        'Credit': np.frombuffer(gl['credit'], dtype=np.int64)[order] / 100,
+        'Description': np.array(gl['desc'], dtype=object)[order],
+        'Kind': np.frombuffer(gl['kind'], dtype=np.int8)[order]
+    })
+
+def gl_df():
+    """Returns the General Ledger as a DataFrame, newest first."""
+    with store.lock:
+        gl = store.gl
+        return _cached_frame('gl', len(gl['desc']), lambda: _gl_frame(gl, store.account_codes))
+
+def receivables_df():
+    """Returns the receivable records as a DataFrame, newest first."""
+    with store.lock:
+        rows = store.receivable_rows
+        return _cached_frame('receivable_rows', len(rows), lambda: _records_frame(rows[::-1], RECEIVABLE_COLUMNS))
+
+def payables_df():
+    """Returns the payable records as a DataFrame, newest first."""
+    with store.lock:
+        rows = store.payable_rows
+        return _cached_frame('payable_rows', len(rows), lambda: _records_frame(rows[::-1], PAYABLE_COLUMNS))
+
+def _amount_totals(df, key_col):
+    """Sums the Amount column per key_col value, in order of first appearance."""
+    return df.groupby(key_col, sort=False, observed=True, as_index=False)['Amount'].sum()
+
+def receivables_by_type():
+    """Returns the total receivable Amount per record Type."""
+    with store.lock:
+        rows = store.receivable_rows
+        return _cached_frame('receivables_by_type', len(rows), lambda: _amount_totals(receivables_df(), 'Type'))
+
+def payables_by_category():
+    """Returns the total payable Amount per Vendor/Category."""
+    with store.lock:
+        rows = store.payable_rows
+        return _cached_frame('payables_by_category', len(rows), lambda: _amount_totals(payables_df(), 'Vendor/Category'))
+
+def payables_by_vendor():
+    """Returns the total payable Amount per Vendor/Category as a Series, largest first."""
+    with store.lock:
+        rows = store.payable_rows
+        return _cached_frame('payables_by_vendor', len(rows),
+                             lambda: payables_by_category().set_index('Vendor/Category')['Amount'].sort_values(ascending=False))
+
+def _record_date(record):
+    return record['Date']
+
+def inventory_df():
+    """Returns the inventory as a DataFrame."""
+    with store.lock:
+        inventory = store.inventory_by_name
+        return _cached_frame('inventory', store.inventory_version, lambda: (
+            pd.DataFrame.from_dict(inventory, orient='index', columns=INVENTORY_COLUMNS[1:])
+            .rename_axis('Item')
+            .reset_index()
+        ))
+
+def fixed_assets_df():
+    """Returns the fixed asset register as a DataFrame."""
+    with store.lock:
+        rows = store.fixed_asset_rows
+        return _cached_frame('fixed_assets', store.fixed_assets_version, lambda: (
+            pd.DataFrame(rows, columns=list(FIXED_ASSET_DTYPES)).astype(FIXED_ASSET_DTYPES)
+        ))
+
+def gl_cache_key():
+    """Identifies the current GL contents; used as the key for the cached reports."""
+    return len(store.gl['desc']), store.gl_digest
+
+def _extend_gl(date, accounts, debits, credits, descriptions, kinds):
+    """Posts a batch of GL entries dated `date`, given column-wise as equal-length lists.
+
+    Debit and credit amounts are in dollars and are rounded to the nearest cent.
+    """
+    account_codes = store.account_codes
+    gl = store.gl
+    debit_cents = [round(amount * 100) for amount in debits]
+    credit_cents = [round(amount * 100) for amount in credits]
+    # Convert every column before extending any, so a bad value cannot leave the columns misaligned
+    batch = {
+        'date': array('q', [date.toordinal() - EPOCH_ORDINAL]) * len(accounts),
+        'account_code': array('i', [account_codes.setdefault(account, len(account_codes)) for account in accounts]),
+        'debit': array('q', debit_cents),
+        'credit': array('q', credit_cents),
+        'kind': array('b', kinds)
+    }
+    for column, values in batch.items():
+        gl[column].extend(values)
+    gl['desc'].extend(descriptions)
+    totals = store.account_totals
+    for account, debit, credit in zip(accounts, debit_cents, credit_cents):
+        account_total = totals.setdefault(account, [0, 0])
+        account_total[0] += debit
+        account_total[1] += credit
+    # Keep a running digest of the GL so cached reports are never shared between different ledgers
+    batch_key = f"{store.gl_digest}|{date}|{accounts}|{debit_cents}|{credit_cents}|{descriptions}|{[int(kind) for kind in kinds]}"
+    store.gl_digest = hashlib.blake2b(batch_key.encode(), digest_size=16).hexdigest()
+
+def post_batch(date, entries):
+    """Posts all legs of a compound journal entry to the GL in one call.
+
+    Each entry is an (account, debit, credit, description, kind) tuple.
+    """
+    accounts, debits, credits, descriptions, kinds = (list(column) for column in zip(*entries))
+    _extend_gl(date, accounts, debits, credits, descriptions, kinds)
 
 def add_receivable_record(date, customer, record_type, amount, description):
     """Adds a new receivable record and posts to GL."""
-    new_record = pd.DataFrame([{
+    bisect.insort(store.receivable_rows, {
         'Date': date,
         'Customer': customer,
         'Type': record_type, # 'Cash' or 'Credit'
         'Amount': amount,
         'Description': description
-    }])
-    new_record = new_record.astype(st.session_state.receivables.dtypes)
-    st.session_state.receivables = pd.concat([st.session_state.receivables, new_record], ignore_index=True)
+    }, key=_record_date)
+    store.dirty.add('receivables')
 
     # Post to GL
     if record_type == 'Cash':
-        post_to_gl(date, 'Cash', amount, 0, f"Cash Sale to {customer}: {description}")
-        post_to_gl(date, 'Sales Revenue', 0, amount, f"Cash Sale to {customer}: {description}")
+        post_batch(date, [
+            ('Cash', amount, 0, f"Cash Sale to {customer}: {description}", TxnKind.CASH_SALE),
+            ('Sales Revenue', 0, amount, f"Cash Sale to {customer}: {description}", TxnKind.CASH_SALE)
+        ])
     else: # Credit
-        post_to_gl(date, 'Accounts Receivable', amount, 0, f"Credit Sale to {customer}: {description}")
-        post_to_gl(date, 'Sales Revenue', 0, amount, f"Credit Sale to {customer}: {description}")
+        post_batch(date, [
+            ('Accounts Receivable', amount, 0, f"Credit Sale to {customer}: {description}", TxnKind.CREDIT_SALE),
+            ('Sales Revenue', 0, amount, f"Credit Sale to {customer}: {description}", TxnKind.CREDIT_SALE)
+        ])
     st.success("Receivable record added successfully and posted to GL!")
 
 def add_payable_record(date, vendor_category, amount, description):
     """Adds a new payable record and posts to GL."""
-    new_record = pd.DataFrame([{
+    bisect.insort(store.payable_rows, {
         'Date': date,
         'Vendor/Category': vendor_category,
         'Amount': amount,
         'Description': description
-    }])
-    new_record = new_record.astype(st.session_state.payables.dtypes)
-    st.session_state.payables = pd.concat([st.session_state.payables, new_record], ignore_index=True)
+    }, key=_record_date)
+    store.dirty.add('payables')
 
     # Post to GL (assuming cash payment for simplicity, could be Accounts Payable)
-    post_to_gl(date, 'Expenses', amount, 0, f"Expense: {vendor_category} - {description}")
-    post_to_gl(date, 'Cash', 0, amount, f"Cash Payment for {vendor_category}: {description}")
+    post_batch(date, [
+        ('Expenses', amount, 0, f"Expense: {vendor_category} - {description}", TxnKind.EXPENSE_PAYMENT),
+        ('Cash', 0, amount, f"Cash Payment for {vendor_category}: {description}", TxnKind.EXPENSE_PAYMENT)
+    ])
     st.success("Payable record added successfully and posted to GL!")
 
 def add_sale_record(date, item, quantity, customer, sale_type):
     """Handles a POS sale, updates inventory, and posts to GL."""
-    if item not in st.session_state.inventory['Item'].values:
+    item_row = store.inventory_by_name.get(item)
+    if item_row is None:
         return 'error', 'Item not found in inventory.'
 
-    item_row = st.session_state.inventory[st.session_state.inventory['Item'] == item].iloc[0]
     if quantity > item_row['Quantity']:
         return 'error', f"Not enough stock. Only {item_row['Quantity']} units available."
 
@@ -128,20 +505,25 @@ def add_sale_record(date, item, quantity, customer, sale_type):
     total_sales_revenue = quantity * item_row['Selling Price']
     cost_of_goods_sold = quantity * item_row['Unit Cost']
 
-    # Update inventory
-    st.session_state.inventory.loc[item_row.name, 'Quantity'] -= quantity
-    st.session_state.inventory.loc[item_row.name, 'Last Updated'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
     # Post to GL - Sales Revenue
     if sale_type == 'Cash':
-        post_to_gl(date, 'Cash', total_sales_revenue, 0, f"Cash Sale of {quantity} units of {item} to {customer}")
+        sale_kind = TxnKind.CASH_SALE
+        entries = [('Cash', total_sales_revenue, 0, f"Cash Sale of {quantity} units of {item} to {customer}", sale_kind)]
     else: # Credit
-        post_to_gl(date, 'Accounts Receivable', total_sales_revenue, 0, f"Credit Sale of {quantity} units of {item} to {customer}")
-    post_to_gl(date, 'Sales Revenue', 0, total_sales_revenue, f"Sale of {quantity} units of {item} to {customer}")
+        sale_kind = TxnKind.CREDIT_SALE
+        entries = [('Accounts Receivable', total_sales_revenue, 0, f"Credit Sale of {quantity} units of {item} to {customer}", sale_kind)]
+    entries.append(('Sales Revenue', 0, total_sales_revenue, f"Sale of {quantity} units of {item} to {customer}", sale_kind))
 
     # Post to GL - Cost of Goods Sold
-    post_to_gl(date, 'Cost of Goods Sold', cost_of_goods_sold, 0, f"COGS for {quantity} units of {item} sold to {customer}")
-    post_to_gl(date, 'Inventory', 0, cost_of_goods_sold, f"Inventory reduction for {quantity} units of {item} sold to {customer}")
+    entries.append(('Cost of Goods Sold', cost_of_goods_sold, 0, f"COGS for {quantity} units of {item} sold to {customer}", TxnKind.COGS))
+    entries.append(('Inventory', 0, cost_of_goods_sold, f"Inventory reduction for {quantity} units of {item} sold to {customer}", TxnKind.COGS))
+    post_batch(date, entries)
+
+    # Update inventory only once the sale is in the GL
+    item_row['Quantity'] -= quantity
+    item_row['Last Updated'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    store.inventory_version += 1
+    store.dirty.add('inventory')
 
     return 'success', "Sale recorded successfully and inventory updated!"
 
@@ -152,93 +534,145 @@ def generate_asset_tag(company, category, year, location):
 
 def calculate_and_post_depreciation(date):
     """Calculates and posts annual straight-line depreciation for all fixed assets."""
-    if st.session_state.fixed_assets.empty:
+    if not store.fixed_asset_rows:
         return 'warning', "No fixed assets to depreciate."
 
-    gl = st.session_state.general_ledger
     # Check if depreciation has already been posted for the current year
     current_year = date.year
-    if not gl[(gl['Account'] == 'Depreciation Expense') & (gl['Date'].dt.year == current_year)].empty:
+    if current_year in store.depreciated_years:
         return 'warning', f"Depreciation for {current_year} has already been posted."
 
-    for index, row in st.session_state.fixed_assets.iterrows():
-        if row['Useful Life (Years)'] > 0:
-            # Calculate annual depreciation using the straight-line method
-            annual_depreciation = (row['Cost'] - row['Salvage Value']) / row['Useful Life (Years)']
-            
-            # Post to GL
-            post_to_gl(date, 'Depreciation Expense', annual_depreciation, 0, f"Annual depreciation for {row['Asset Name']}")
-            post_to_gl(date, 'Accumulated Depreciation', 0, annual_depreciation, f"Annual depreciation for {row['Asset Name']}")
-            
-            # Update the accumulated depreciation in the fixed assets register
-            st.session_state.fixed_assets.loc[index, 'Accumulated Depreciation'] += annual_depreciation
-    
+    fa = fixed_assets_df()
+    cost = fa['Cost'].to_numpy(dtype=np.float64)
+    salvage = fa['Salvage Value'].to_numpy(dtype=np.float64)
+    life = fa['Useful Life (Years)'].to_numpy(dtype=np.float64)
+    depreciable = life > 0
+
+    # Calculate annual depreciation for every asset at once using the straight-line method
+    annual_depreciation = np.where(depreciable, (cost - salvage) / np.where(depreciable, life, 1), 0.0)[depreciable]
+    # Round the charges to cents once, so the GL and the register record the same amounts
+    annual_depreciation = np.rint(annual_depreciation * 100) / 100
+
+    # Post to GL: an expense entry followed by an accumulated depreciation entry for each asset
+    zeros = np.zeros_like(annual_depreciation)
+    descriptions = [f"Annual depreciation for {name}" for name in fa['Asset Name'].to_numpy()[depreciable]]
+    _extend_gl(
+        date,
+        ['Depreciation Expense', 'Accumulated Depreciation'] * len(descriptions),
+        np.column_stack((annual_depreciation, zeros)).ravel().tolist(),
+        np.column_stack((zeros, annual_depreciation)).ravel().tolist(),
+        [description for description in descriptions for _ in range(2)],
+        [TxnKind.DEPRECIATION] * (2 * len(descriptions))
+    )
+
+    # Update the accumulated depreciation in the fixed assets register
+    rows = store.fixed_asset_rows
+    for index, amount in zip(np.flatnonzero(depreciable).tolist(), annual_depreciation.tolist()):
+        rows[index]['Accumulated Depreciation'] = round(rows[index]['Accumulated Depreciation'] + amount, 2)
+    store.fixed_assets_version += 1
+    store.dirty.add('fixed_assets')
+    if depreciable.any():
+        store.depreciated_years.add(current_year)
+        store.dirty.add('depreciated_years')
+
     return 'success', f"Depreciation for {current_year} calculated and posted for all assets."
 
 # --- Financial Statement Generation Functions ---
-
-def generate_trial_balance():
+# Amounts are worked in cents and converted to dollars as each report is built.
+# Each report is memoized on gl_cache_key(), so reruns that post nothing new reuse the
+# previous result. The GL data is passed as underscore arguments, which
+# st.cache_data leaves out of the hash. Most reports only need the running
+# account totals; numpy views over the GL arrays must not outlive a report
+# call, since a live view stops the arrays from growing. The caches are shared
+# by all sessions, so each keeps only the most recent GL versions.
+
+def _split_totals(totals):
+    """Splits the running account totals into debit and credit dicts."""
+    return (
+        {account: total[0] for account, total in totals.items()},
+        {account: total[1] for account, total in totals.items()}
+    )
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def _trial_balance(gl_key, _totals):
     """Generates a simplified Trial Balance from the GL."""
-    gl = st.session_state.general_ledger
-    if gl.empty:
+    if not _totals:
         return pd.DataFrame(columns=['Account', 'Debit', 'Credit'])
 
-    trial_balance = gl.groupby('Account').agg(
-        Debit=('Debit', 'sum'),
-        Credit=('Credit', 'sum')
-    ).reset_index()
-
-    trial_balance['Balance'] = trial_balance['Debit'] - trial_balance['Credit']
-
-    tb_display = []
-    for index, row in trial_balance.iterrows():
-        if abs(row['Balance']) > 0.01: # Only include accounts with a balance
-            if row['Balance'] > 0: # Debit balance
-                tb_display.append({'Account': row['Account'], 'Debit': row['Balance'], 'Credit': 0.0})
-            else: # Credit balance
-                tb_display.append({'Account': row['Account'], 'Debit': 0.0, 'Credit': abs(row['Balance'])})
-
-    tb_df = pd.DataFrame(tb_display)
+    accounts = sorted(_totals)
+    balance = np.array([_totals[account][0] - _totals[account][1] for account in accounts])
+
+    has_balance = balance != 0 # Only include accounts with a balance
+    is_debit = balance > 0 # Debit balance, otherwise a credit balance
+    debit = np.where(is_debit, balance, 0)[has_balance]
+    credit = np.where(is_debit, 0, -balance)[has_balance]
+    tb_df = pd.DataFrame({
+        'Account': np.array(accounts, dtype=object)[has_balance],
+        'Debit': debit / 100,
+        'Credit': credit / 100
+    })
     if not tb_df.empty:
-        tb_df.loc['Total'] = tb_df.sum(numeric_only=True)
-        tb_df.loc['Total', 'Account'] = 'Total'
-    return tb_df.fillna('')
+        # Totalled in cents, so balanced debits and credits compare exactly equal
+        tb_df.loc['Total'] = ['Total', debit.sum() / 100, credit.sum() / 100]
+    return tb_df
 
-def generate_income_statement():
+def generate_trial_balance():
+    """Returns the Trial Balance for the current GL."""
+    with store.lock:
+        return _trial_balance(gl_cache_key(), store.account_totals)
+
+def _income_lines(totals):
+    """Returns revenue, COGS, other expenses and depreciation expense in cents from the account totals."""
+    no_entries = (0, 0)
+    return (
+        totals.get('Sales Revenue', no_entries)[1],
+        totals.get('Cost of Goods Sold', no_entries)[0],
+        totals.get('Expenses', no_entries)[0],
+        totals.get('Depreciation Expense', no_entries)[0]
+    )
+
+def _net_income(totals):
+    """Computes net income in cents from the account totals without building the Income Statement."""
+    revenue, cogs, expenses, depreciation_expense = _income_lines(totals)
+    return (revenue - cogs) - (expenses + depreciation_expense)
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def _income_statement(gl_key, _totals):
     """Generates a simplified Income Statement, including COGS."""
-    gl = st.session_state.general_ledger
-    if gl.empty:
+    if not _totals:
         return pd.DataFrame(columns=['Item', 'Amount'])
 
-    revenue = gl[gl['Account'] == 'Sales Revenue']['Credit'].sum()
-    cogs = gl[gl['Account'] == 'Cost of Goods Sold']['Debit'].sum()
+    revenue, cogs, expenses, depreciation_expense = _income_lines(_totals)
     gross_profit = revenue - cogs
     
-    # Sum up other expenses from GL
-    expenses = gl[gl['Account'] == 'Expenses']['Debit'].sum()
-    depreciation_expense = gl[gl['Account'] == 'Depreciation Expense']['Debit'].sum()
-    
     total_operating_expenses = expenses + depreciation_expense
     net_income = gross_profit - total_operating_expenses
 
     data = {
         'Item': ['Sales Revenue', 'Less: Cost of Goods Sold', 'Gross Profit', 'Less: Operating Expenses', 'Less: Depreciation Expense', 'Net Income (Loss)'],
-        'Amount': [revenue, -cogs, gross_profit, -expenses, -depreciation_expense, net_income]
+        'Amount': np.array([revenue, -cogs, gross_profit, -expenses, -depreciation_expense, net_income]) / 100
     }
     return pd.DataFrame(data)
 
-def generate_balance_sheet():
+def generate_income_statement():
+    """Returns the Income Statement for the current GL."""
+    with store.lock:
+        return _income_statement(gl_cache_key(), store.account_totals)
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def _balance_sheet(gl_key, _totals):
     """Generates a simplified Balance Sheet."""
-    gl = st.session_state.general_ledger
-    if gl.empty:
+    if not _totals:
         return pd.DataFrame(columns=['Category', 'Account', 'Amount'])
 
+    debits, credits = _split_totals(_totals)
+
     # Assets
-    cash = gl[gl['Account'] == 'Cash']['Debit'].sum() - gl[gl['Account'] == 'Cash']['Credit'].sum()
-    accounts_receivable = gl[gl['Account'] == 'Accounts Receivable']['Debit'].sum() - gl[gl['Account'] == 'Accounts Receivable']['Credit'].sum()
-    inventory = gl[gl['Account'] == 'Inventory']['Debit'].sum() - gl[gl['Account'] == 'Inventory']['Credit'].sum()
-    fixed_assets_cost = gl[gl['Account'] == 'Fixed Assets']['Debit'].sum()
-    accumulated_depreciation = gl[gl['Account'] == 'Accumulated Depreciation']['Credit'].sum()
+    cash = debits.get('Cash', 0) - credits.get('Cash', 0)
+    accounts_receivable = debits.get('Accounts Receivable', 0) - credits.get('Accounts Receivable', 0)
+    inventory = debits.get('Inventory', 0) - credits.get('Inventory', 0)
+    fixed_assets_cost = debits.get('Fixed Assets', 0)
+    accumulated_depreciation = credits.get('Accumulated Depreciation', 0)
     net_fixed_assets = fixed_assets_cost - accumulated_depreciation
 
     total_current_assets = cash + accounts_receivable + inventory
@@ -246,12 +680,12 @@ def generate_balance_sheet():
     total_assets = total_current_assets + total_non_current_assets
 
     # Liabilities & Equity
-    accounts_payable = gl[gl['Account'] == 'Accounts Payable']['Credit'].sum() - gl[gl['Account'] == 'Accounts Payable']['Debit'].sum()
+    accounts_payable = credits.get('Accounts Payable', 0) - debits.get('Accounts Payable', 0)
     # Assume 0 long-term debt for simplicity
     
     # Equity is derived from initial investment + retained earnings (net income)
-    net_income = generate_income_statement()['Amount'].iloc[-1] if not generate_income_statement().empty else 0.0
-    initial_equity = 0.0 # Placeholder
+    net_income = _net_income(_totals)
+    initial_equity = 0 # Placeholder
     retained_earnings = net_income
     total_equity = initial_equity + retained_earnings
 
@@ -275,24 +709,37 @@ def generate_balance_sheet():
     ]
     
     combined_df = pd.DataFrame(assets_data + liabilities_equity_data)
+    combined_df['Amount'] = combined_df['Amount'] / 100
     return combined_df
 
-def generate_cash_flow_statement():
+def generate_balance_sheet():
+    """Returns the Balance Sheet for the current GL."""
+    with store.lock:
+        return _balance_sheet(gl_cache_key(), store.account_totals)
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def _cash_flow_statement(gl_key, _gl, _account_codes):
     """Generates a simplified Cash Flow Statement."""
-    gl = st.session_state.general_ledger
-    if gl.empty:
+    gl = _gl
+    if not gl['desc']:
         return pd.DataFrame(columns=['Activity', 'Amount'])
 
-    cash_in_from_sales = gl[(gl['Account'] == 'Cash') & (gl['Debit'] > 0) & (gl['Description'].str.contains('Sale'))]['Debit'].sum()
-    cash_out_for_expenses = gl[(gl['Account'] == 'Cash') & (gl['Credit'] > 0) & (gl['Description'].str.contains('Payment'))]['Credit'].sum()
+    # Classify cash movements by the transaction kind tagged at posting time
+    is_cash = np.frombuffer(gl['account_code'], dtype=np.intc) == _account_codes.get('Cash', -1)
+    kind = np.frombuffer(gl['kind'], dtype=np.int8)
+    debit = np.frombuffer(gl['debit'], dtype=np.int64)
+    credit = np.frombuffer(gl['credit'], dtype=np.int64)
+
+    cash_in_from_sales = debit[is_cash & (debit > 0) & (kind == TxnKind.CASH_SALE)].sum()
+    cash_out_for_expenses = credit[is_cash & (credit > 0) & (kind == TxnKind.EXPENSE_PAYMENT)].sum()
     net_cash_operating = cash_in_from_sales - cash_out_for_expenses
 
-    cash_out_fixed_assets = gl[(gl['Account'] == 'Cash') & (gl['Credit'] > 0) & (gl['Description'].str.contains('Acquisition'))]['Credit'].sum()
+    cash_out_fixed_assets = credit[is_cash & (credit > 0) & (kind == TxnKind.ASSET_ACQUISITION)].sum()
     net_cash_investing = -cash_out_fixed_assets
 
-    net_cash_financing = 0.0
+    net_cash_financing = 0
     net_increase_decrease_in_cash = net_cash_operating + net_cash_investing + net_cash_financing
-    beginning_cash_balance = 0.0
+    beginning_cash_balance = 0
     ending_cash_balance = beginning_cash_balance + net_increase_decrease_in_cash
 
     data = {
@@ -304,23 +751,28 @@ def generate_cash_flow_statement():
             'Beginning Cash Balance',
             'Ending Cash Balance'
         ],
-        'Amount': [
+        'Amount': np.array([
             net_cash_operating,
             net_cash_investing,
             net_cash_financing,
             net_increase_decrease_in_cash,
             beginning_cash_balance,
             ending_cash_balance
-        ]
+        ]) / 100
     }
     return pd.DataFrame(data)
 
-def generate_statement_of_change_in_equity():
+def generate_cash_flow_statement():
+    """Returns the Cash Flow Statement for the current GL."""
+    with store.lock:
+        return _cash_flow_statement(gl_cache_key(), store.gl, store.account_codes)
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def _statement_of_change_in_equity(gl_key, _totals):
     """Generates a simplified Statement of Change in Equity."""
-    income_statement = generate_income_statement()
-    net_income = income_statement['Amount'].iloc[-1] if not income_statement.empty else 0.0
+    net_income = _net_income(_totals)
 
-    beginning_equity = 0.0
+    beginning_equity = 0
     ending_equity = beginning_equity + net_income
 
     data = {
@@ -330,45 +782,127 @@ def generate_statement_of_change_in_equity():
             'Less: Dividends/Withdrawals (N/A in demo)',
             'Ending Equity Balance'
         ],
-        'Amount': [
+        'Amount': np.array([
             beginning_equity,
             net_income,
-            0.0,
+            0,
             ending_equity
-        ]
+        ]) / 100
     }
     return pd.DataFrame(data)
 
+def generate_statement_of_change_in_equity():
+    """Returns the Statement of Change in Equity for the current GL."""
+    with store.lock:
+        return _statement_of_change_in_equity(gl_cache_key(), store.account_totals)
+
+def generate_all_reports():
+    """Builds every financial statement concurrently from the current GL.
+
+    The GL data is read here, on the script thread; the workers only run the
+    report builders on it and never touch session state. The store's lock is
+    held until they finish, so no entries are posted while they read the GL.
+    """
+    with store.lock:
+        gl_key = gl_cache_key()
+        totals = store.account_totals
+        builders = {
+            'trial_balance': (_trial_balance, totals),
+            'income_statement': (_income_statement, totals),
+            'balance_sheet': (_balance_sheet, totals),
+            'cash_flow_statement': (_cash_flow_statement, store.gl, store.account_codes),
+            'statement_of_change_in_equity': (_statement_of_change_in_equity, totals)
+        }
+        with ThreadPoolExecutor(max_workers=len(builders)) as executor:
+            futures = {name: executor.submit(build, gl_key, *args) for name, (build, *args) in builders.items()}
+        return {name: future.result() for name, future in futures.items()}
+
 # --- Financial Analytics Functions (using uploaded data) ---
-# (Unchanged from original script as they rely on uploaded data, not the app's internal state)
+# These work from the per-Item Amount totals of the uploaded statements, not the ledger store
+
+# Uploaded statements are parsed this many rows at a time
+CSV_CHUNK_ROWS = 50_000
+
+def load_statement_csv(uploaded_file):
+    """Reads an uploaded statement CSV in chunks, parsing only its 'Item' and 'Amount' columns.
+
+    Returns None if the header lacks either column.
+    """
+    uploaded_file.seek(0)
+    # Read just the header first, so a file without the required columns is rejected unparsed
+    headers = {column.strip(): column for column in pd.read_csv(uploaded_file, nrows=0).columns}
+    if not {'Item', 'Amount'}.issubset(headers):
+        return None
+    uploaded_file.seek(0)
+
+    column_names = {headers['Item']: 'Item', headers['Amount']: 'Amount'}
+    chunks = []
+    with pd.read_csv(uploaded_file, chunksize=CSV_CHUNK_ROWS, usecols=list(column_names),
+                     converters={headers['Item']: str.strip}, on_bad_lines='skip') as reader:
+        for chunk in reader:
+            chunk = chunk.rename(columns=column_names)
+            # Convert 'Amount' column to numeric, coercing errors
+            chunk['Amount'] = pd.to_numeric(chunk['Amount'], errors='coerce')
+            chunks.append(chunk)
+    df = pd.concat(chunks, ignore_index=True)
+    # Categories are assigned after the concat, since chunks would each get their own
+    df['Item'] = df['Item'].astype('category')
+    return df
+
+def item_totals(df):
+    """Sums an uploaded statement's Amount column per Item."""
+    return df.groupby('Item', sort=False, observed=True)['Amount'].sum()
+
+# Keyed on the upload's id and size, so reruns skip parsing the same file again
+@st.cache_data(show_spinner="Parsing CSV...", max_entries=8, hash_funcs={UploadedFile: lambda f: (f.file_id, f.size)})
+def _load_statement(uploaded_file):
+    """Parses an uploaded statement into its frame and per-Item totals, or None if it lacks the required columns."""
+    df = load_statement_csv(uploaded_file)
+    if df is None:
+        return None
+    return df, item_totals(df)
+
+def base_metrics(is_totals):
+    """Returns the uploaded Income Statement figures that the forecast and scenario start from."""
+    revenue = is_totals.get('Sales Revenue', 0)
+    cogs = is_totals.get('Cost of Goods Sold', 0)
+    op_exp = is_totals.get('Operating Expenses', 0)
+    return {
+        'revenue': revenue,
+        'cogs': cogs,
+        'op_exp': op_exp,
+        'net_income': revenue - cogs - op_exp,
+        'cogs_pct': (cogs / revenue * 100) if revenue else 0,
+        'op_exp_pct': (op_exp / revenue * 100) if revenue else 0
+    }
 
-def calculate_ratios(is_df, bs_df):
-    """Calculates key financial ratios from uploaded Income Statement and Balance Sheet."""
+def calculate_ratios(is_totals, bs_totals):
+    """Calculates key financial ratios from the uploaded Income Statement and Balance Sheet totals."""
     ratios = {}
     try:
         # Income Statement items
-        revenue = is_df[is_df['Item'] == 'Sales Revenue']['Amount'].sum()
-        cogs = is_df[is_df['Item'] == 'Cost of Goods Sold']['Amount'].sum()
+        revenue = is_totals.get('Sales Revenue', 0)
+        cogs = is_totals.get('Cost of Goods Sold', 0)
         gross_profit = revenue - cogs
-        operating_expenses = is_df[is_df['Item'] == 'Operating Expenses']['Amount'].sum()
-        interest_expense = is_df[is_df['Item'] == 'Interest Expense']['Amount'].sum()
-        taxes = is_df[is_df['Item'] == 'Taxes']['Amount'].sum()
+        operating_expenses = is_totals.get('Operating Expenses', 0)
+        interest_expense = is_totals.get('Interest Expense', 0)
+        taxes = is_totals.get('Taxes', 0)
         net_income = revenue - cogs - operating_expenses - interest_expense - taxes
 
         # Balance Sheet items
-        cash = bs_df[bs_df['Item'] == 'Cash']['Amount'].sum()
-        accounts_receivable = bs_df[bs_df['Item'] == 'Accounts Receivable']['Amount'].sum()
-        inventory = bs_df[bs_df['Item'] == 'Inventory']['Amount'].sum()
+        cash = bs_totals.get('Cash', 0)
+        accounts_receivable = bs_totals.get('Accounts Receivable', 0)
+        inventory = bs_totals.get('Inventory', 0)
         current_assets = cash + accounts_receivable + inventory
-        fixed_assets_net = bs_df[bs_df['Item'] == 'Fixed Assets (Net)']['Amount'].sum()
+        fixed_assets_net = bs_totals.get('Fixed Assets (Net)', 0)
         total_assets = current_assets + fixed_assets_net
         
-        accounts_payable = bs_df[bs_df['Item'] == 'Accounts Payable']['Amount'].sum()
+        accounts_payable = bs_totals.get('Accounts Payable', 0)
         current_liabilities = accounts_payable
-        long_term_debt = bs_df[bs_df['Item'] == 'Long-term Debt']['Amount'].sum() if 'Long-term Debt' in bs_df['Item'].values else 0
+        long_term_debt = bs_totals.get('Long-term Debt', 0)
         total_liabilities = current_liabilities + long_term_debt
 
-        owner_equity = bs_df[bs_df['Item'] == 'Owner\'s Equity (Simplified)']['Amount'].sum()
+        owner_equity = bs_totals.get('Owner\'s Equity (Simplified)', 0)
         total_liabilities_equity = total_liabilities + owner_equity
 
         # Profitability Ratios
@@ -394,105 +928,116 @@ def calculate_ratios(is_df, bs_df):
         return {}
     return ratios
 
-def forecast_financials(is_df, bs_df, years, revenue_growth, cogs_pct_revenue, op_exp_pct_revenue):
-    """Performs a simple financial forecast for N years."""
-    if is_df.empty or bs_df.empty:
+FORECAST_IS_COLUMNS = ['Year', 'Sales Revenue', 'Cost of Goods Sold', 'Gross Profit', 'Operating Expenses', 'Net Income']
+FORECAST_BS_COLUMNS = ['Year', 'Cash', 'Accounts Receivable', 'Inventory', 'Current Assets', 'Fixed Assets (Net)', 'Total Assets', 'Accounts Payable', 'Long-term Debt', 'Total Liabilities', 'Owner\'s Equity', 'Total Liabilities & Equity']
+
+def _project_financials(years, start_year, revenue_growth, cogs_pct_revenue, op_exp_pct_revenue,
+                        prev_revenue, prev_cash, prev_ar, prev_inv, prev_fixed_assets_net, prev_ap, prev_lt_debt, prev_owner_equity):
+    """Projects the forecast IS and BS arrays for all years at once.
+
+    Cash and owner's equity carry forward each year's net income, so they are
+    running sums; the working capital changes telescope to the change since
+    the current year.
+    """
+    # Income Statement Projection
+    proj_year = start_year + np.arange(1, years + 1, dtype=np.float64)
+    proj_revenue = prev_revenue * np.cumprod(np.full(years, 1 + revenue_growth / 100))
+    proj_cogs = proj_revenue * (cogs_pct_revenue / 100)
+    proj_gross_profit = proj_revenue - proj_cogs
+    proj_op_exp = proj_revenue * (op_exp_pct_revenue / 100)
+    proj_net_income = proj_gross_profit - proj_op_exp
+
+    # Balance Sheet Projection
+    proj_ar = proj_revenue * 0.1
+    proj_inv = proj_cogs * 0.05
+    proj_ap = proj_cogs * 0.05
+
+    cumulative_net_income = np.cumsum(proj_net_income)
+    proj_cash = prev_cash + cumulative_net_income - (proj_ar - prev_ar) - (proj_inv - prev_inv) + (proj_ap - prev_ap)
+    proj_owner_equity = prev_owner_equity + cumulative_net_income
+
+    proj_current_assets = proj_cash + proj_ar + proj_inv
+    proj_fixed_assets_net = np.full(years, prev_fixed_assets_net)
+    proj_total_assets = proj_current_assets + proj_fixed_assets_net
+
+    proj_current_liabilities = proj_ap
+    proj_lt_debt = np.full(years, prev_lt_debt)
+    proj_total_liabilities = proj_current_liabilities + proj_lt_debt
+    proj_total_liabilities_equity = proj_total_liabilities + proj_owner_equity
+
+    is_arr = np.column_stack((
+        proj_year,
+        proj_revenue,
+        proj_cogs,
+        proj_gross_profit,
+        proj_op_exp,
+        proj_net_income
+    ))
+    bs_arr = np.column_stack((
+        proj_year,
+        proj_cash,
+        proj_ar,
+        proj_inv,
+        proj_current_assets,
+        proj_fixed_assets_net,
+        proj_total_assets,
+        proj_ap,
+        proj_lt_debt,
+        proj_total_liabilities,
+        proj_owner_equity,
+        proj_total_liabilities_equity
+    ))
+    return is_arr, bs_arr
+
+def forecast_financials(is_totals, bs_totals, years, revenue_growth, cogs_pct_revenue, op_exp_pct_revenue):
+    """Performs a simple financial forecast for N years from the uploaded statement totals."""
+    if is_totals.empty or bs_totals.empty:
         return None, None
 
-    forecast_is = pd.DataFrame(columns=['Year', 'Sales Revenue', 'Cost of Goods Sold', 'Gross Profit', 'Operating Expenses', 'Net Income'])
-    forecast_bs = pd.DataFrame(columns=['Year', 'Cash', 'Accounts Receivable', 'Inventory', 'Current Assets', 'Fixed Assets (Net)', 'Total Assets', 'Accounts Payable', 'Long-term Debt', 'Total Liabilities', 'Owner\'s Equity', 'Total Liabilities & Equity'])
-
-    current_revenue = is_df[is_df['Item'] == 'Sales Revenue']['Amount'].sum() if 'Amount' in is_df.columns else 0
-    current_cogs = is_df[is_df['Item'] == 'Cost of Goods Sold']['Amount'].sum() if 'Amount' in is_df.columns else 0
-    current_operating_expenses = is_df[is_df['Item'] == 'Operating Expenses']['Amount'].sum() if 'Amount' in is_df.columns else 0
-    current_net_income = is_df[is_df['Item'] == 'Net Income (Loss)']['Amount'].sum() if 'Amount' in is_df.columns else 0
-
-    current_cash = bs_df[bs_df['Item'] == 'Cash']['Amount'].sum() if 'Amount' in bs_df.columns else 0
-    current_ar = bs_df[bs_df['Item'] == 'Accounts Receivable']['Amount'].sum() if 'Amount' in bs_df.columns else 0
-    current_inv = bs_df[bs_df['Item'] == 'Inventory']['Amount'].sum() if 'Amount' in bs_df.columns else 0
-    current_fixed_assets_net = bs_df[bs_df['Item'] == 'Fixed Assets (Net)']['Amount'].sum() if 'Amount' in bs_df.columns else 0
-    current_ap = bs_df[bs_df['Item'] == 'Accounts Payable']['Amount'].sum() if 'Amount' in bs_df.columns else 0
-    current_lt_debt = bs_df[bs_df['Item'] == 'Long-term Debt']['Amount'].sum() if 'Long-term Debt' in bs_df['Item'].values else 0
-    current_owner_equity = bs_df[bs_df['Item'] == 'Owner\'s Equity (Simplified)']['Amount'].sum() if 'Amount' in bs_df.columns else 0
-
-    prev_revenue = current_revenue
-    prev_cogs = current_cogs
-    prev_op_exp = current_operating_expenses
-    prev_net_income = current_net_income
-    prev_cash = current_cash
-    prev_ar = current_ar
-    prev_inv = current_inv
-    prev_fixed_assets_net = current_fixed_assets_net
-    prev_ap = current_ap
-    prev_lt_debt = current_lt_debt
-    prev_owner_equity = current_owner_equity
-
-    for i in range(1, years + 1):
-        # Income Statement Projection
-        proj_revenue = prev_revenue * (1 + revenue_growth / 100)
-        proj_cogs = proj_revenue * (cogs_pct_revenue / 100)
-        proj_gross_profit = proj_revenue - proj_cogs
-        proj_op_exp = proj_revenue * (op_exp_pct_revenue / 100)
-        proj_net_income = proj_gross_profit - proj_op_exp
-
-        forecast_is.loc[i-1] = [
-            datetime.now().year + i,
-            proj_revenue,
-            proj_cogs,
-            proj_gross_profit,
-            proj_op_exp,
-            proj_net_income
-        ]
-
-        # Balance Sheet Projection
-        proj_ar = proj_revenue * 0.1
-        proj_inv = proj_cogs * 0.05
-        proj_ap = proj_cogs * 0.05
-        proj_cash = prev_cash + proj_net_income - (proj_ar - prev_ar) - (proj_inv - prev_inv) + (proj_ap - prev_ap)
-
-        proj_current_assets = proj_cash + proj_ar + proj_inv
-        proj_fixed_assets_net = prev_fixed_assets_net
-        proj_total_assets = proj_current_assets + proj_fixed_assets_net
-
-        proj_current_liabilities = proj_ap
-        proj_lt_debt = prev_lt_debt
-        proj_total_liabilities = proj_current_liabilities + proj_lt_debt
-        proj_owner_equity = prev_owner_equity + proj_net_income
-        proj_total_liabilities_equity = proj_total_liabilities + proj_owner_equity
-
-        forecast_bs.loc[i-1] = [
-            datetime.now().year + i,
-            proj_cash,
-            proj_ar,
-            proj_inv,
-            proj_current_assets,
-            proj_fixed_assets_net,
-            proj_total_assets,
-            proj_ap,
-            proj_lt_debt,
-            proj_total_liabilities,
-            proj_owner_equity,
-            proj_total_liabilities_equity
-        ]
-
-        # Update previous values for next iteration
-        prev_revenue = proj_revenue
-        prev_cogs = proj_cogs
-        prev_op_exp = proj_op_exp
-        prev_net_income = proj_net_income
-        prev_cash = proj_cash
-        prev_ar = proj_ar
-        prev_inv = proj_inv
-        prev_fixed_assets_net = proj_fixed_assets_net
-        prev_ap = proj_ap
-        prev_lt_debt = proj_lt_debt
-        prev_owner_equity = proj_owner_equity
-
+    current_revenue = is_totals.get('Sales Revenue', 0)
+
+    current_cash = bs_totals.get('Cash', 0)
+    current_ar = bs_totals.get('Accounts Receivable', 0)
+    current_inv = bs_totals.get('Inventory', 0)
+    current_fixed_assets_net = bs_totals.get('Fixed Assets (Net)', 0)
+    current_ap = bs_totals.get('Accounts Payable', 0)
+    current_lt_debt = bs_totals.get('Long-term Debt', 0)
+    current_owner_equity = bs_totals.get('Owner\'s Equity (Simplified)', 0)
+
+    is_arr, bs_arr = _project_financials(
+        years, datetime.now().year, revenue_growth, cogs_pct_revenue, op_exp_pct_revenue,
+        float(current_revenue), float(current_cash), float(current_ar), float(current_inv),
+        float(current_fixed_assets_net), float(current_ap), float(current_lt_debt), float(current_owner_equity)
+    )
+    forecast_is = pd.DataFrame(is_arr, columns=FORECAST_IS_COLUMNS)
+    forecast_bs = pd.DataFrame(bs_arr, columns=FORECAST_BS_COLUMNS)
     return forecast_is, forecast_bs
 
-# --- Page Content based on Navigation ---
+# --- Charts ---
+# Figures are built from the aggregate rows as a tuple, so identical data reuses the
+# same figure. Plotly is only imported when a chart is first built.
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def _receivables_bar(agg_rows):
+    """Builds the receivables bar chart from (Type, Amount) rows."""
+    import plotly.express as px
+    agg = pd.DataFrame(agg_rows, columns=['Type', 'Amount'])
+    return px.bar(agg, x='Type', y='Amount', title='Total Receivables by Type (Cash vs. Credit)', labels={'Amount': 'Total Amount ($)', 'Type': 'Record Type'})
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def _payables_pie(agg_rows):
+    """Builds the payables pie chart from (Vendor/Category, Amount) rows."""
+    import plotly.express as px
+    agg = pd.DataFrame(agg_rows, columns=['Vendor/Category', 'Amount'])
+    return px.pie(agg, values='Amount', names='Vendor/Category', title='Payables Distribution by Category')
 
-if page == "Daily Records (Receivables & Payables)":
+def _agg_rows(agg):
+    """Returns an aggregate frame's rows as a hashable tuple."""
+    return tuple(agg.itertuples(index=False, name=None))
+
+# --- Page Content based on Navigation ---
+def render_daily_records():
+    """Renders the receivable and payable entry forms and records."""
     st.title("Daily Records - Receivables & Payables")
     st.header("Daily Records of Receivables")
     with st.expander("Add New Receivable Record"):
@@ -505,12 +1050,13 @@ if page == "Daily Records (Receivables & Payables)":
             submit_receivable = st.form_submit_button("Add Receivable")
             if submit_receivable:
                 if r_customer and r_amount > 0:
-                    add_receivable_record(r_date, r_customer, r_type, r_amount, r_description)
+                    with store.lock:
+                        add_receivable_record(r_date, r_customer, r_type, r_amount, r_description)
                 else:
                     st.error("Please fill in Customer Name and Amount.")
     st.subheader("All Receivable Records")
-    if not st.session_state.receivables.empty:
-        st.dataframe(st.session_state.receivables.sort_values(by='Date', ascending=False).reset_index(drop=True))
+    if store.receivable_rows:
+        st.dataframe(receivables_df())
     else:
         st.info("No receivable records added yet.")
     st.markdown("---")
@@ -524,16 +1070,18 @@ if page == "Daily Records (Receivables & Payables)":
             submit_payable = st.form_submit_button("Add Payable")
             if submit_payable:
                 if p_vendor_category and p_amount > 0:
-                    add_payable_record(p_date, p_vendor_category, p_amount, p_description)
+                    with store.lock:
+                        add_payable_record(p_date, p_vendor_category, p_amount, p_description)
                 else:
                     st.error("Please fill in Vendor/Expense Category and Amount.")
     st.subheader("All Payable Records")
-    if not st.session_state.payables.empty:
-        st.dataframe(st.session_state.payables.sort_values(by='Date', ascending=False).reset_index(drop=True))
+    if store.payable_rows:
+        st.dataframe(payables_df())
     else:
         st.info("No payable records added yet.")
 
-elif page == "Inventory Management":
+def render_inventory():
+    """Renders the inventory form and current stock."""
     st.title("Inventory Management")
     with st.expander("Add/Update Inventory Item"):
         with st.form("inventory_form", clear_on_submit=True):
@@ -544,33 +1092,30 @@ elif page == "Inventory Management":
             submit_inventory = st.form_submit_button("Add/Update Item")
             if submit_inventory:
                 if item_name and quantity >= 0 and unit_cost >= 0 and selling_price >= 0:
-                    if item_name in st.session_state.inventory['Item'].values:
-                        idx = st.session_state.inventory[st.session_state.inventory['Item'] == item_name].index[0]
-                        st.session_state.inventory.loc[idx, 'Quantity'] = quantity
-                        st.session_state.inventory.loc[idx, 'Unit Cost'] = unit_cost
-                        st.session_state.inventory.loc[idx, 'Selling Price'] = selling_price
-                        st.session_state.inventory.loc[idx, 'Last Updated'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                        st.success(f"Inventory for '{item_name}' updated.")
-                    else:
-                        new_item = pd.DataFrame([{
-                            'Item': item_name,
+                    with store.lock:
+                        is_update = item_name in store.inventory_by_name
+                        store.inventory_by_name[item_name] = {
                             'Quantity': quantity,
                             'Unit Cost': unit_cost,
                             'Selling Price': selling_price,
                             'Last Updated': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                        }])
-                        new_item = new_item.astype(st.session_state.inventory.dtypes)
-                        st.session_state.inventory = pd.concat([st.session_state.inventory, new_item], ignore_index=True)
+                        }
+                        store.inventory_version += 1
+                        store.dirty.add('inventory')
+                    if is_update:
+                        st.success(f"Inventory for '{item_name}' updated.")
+                    else:
                         st.success(f"New inventory item '{item_name}' added.")
                 else:
                     st.error("Please fill in all inventory details correctly.")
     st.subheader("Current Inventory Stock")
-    if not st.session_state.inventory.empty:
-        st.dataframe(st.session_state.inventory)
+    if store.inventory_by_name:
+        st.dataframe(inventory_df())
     else:
         st.info("No inventory items added yet.")
 
-elif page == "Fixed Asset Register":
+def render_fixed_assets():
+    """Renders the fixed asset register and depreciation controls."""
     st.title("Fixed Asset Register")
     with st.expander("Add New Fixed Asset"):
         with st.form("fixed_asset_form", clear_on_submit=True):
@@ -585,55 +1130,62 @@ elif page == "Fixed Asset Register":
             if submit_asset:
                 if asset_name and cost > 0 and useful_life > 0 and asset_category and asset_location:
                     asset_tag = generate_asset_tag("YOUR_COMPANY", asset_category, acquisition_date.year, asset_location)
-                    new_asset = pd.DataFrame([{
-                        'Asset Tag': asset_tag,
-                        'Asset Name': asset_name,
-                        'Category': asset_category,
-                        'Location': asset_location,
-                        'Acquisition Date': acquisition_date,
-                        'Cost': cost,
-                        'Salvage Value': salvage_value,
-                        'Useful Life (Years)': useful_life,
-                        'Accumulated Depreciation': 0.0
-                    }])
-                    new_asset = new_asset.astype(st.session_state.fixed_assets.dtypes)
-                    st.session_state.fixed_assets = pd.concat([st.session_state.fixed_assets, new_asset], ignore_index=True)
-                    post_to_gl(acquisition_date, 'Fixed Assets', cost, 0, f"Acquisition of {asset_name} ({asset_tag})")
-                    post_to_gl(acquisition_date, 'Cash', 0, cost, f"Cash payment for {asset_name}")
+                    with store.lock:
+                        store.fixed_asset_rows.append({
+                            'Asset Tag': asset_tag,
+                            'Asset Name': asset_name,
+                            'Category': asset_category,
+                            'Location': asset_location,
+                            'Acquisition Date': acquisition_date,
+                            'Cost': cost,
+                            'Salvage Value': salvage_value,
+                            'Useful Life (Years)': useful_life,
+                            'Accumulated Depreciation': 0.0
+                        })
+                        store.fixed_assets_version += 1
+                        store.dirty.add('fixed_assets')
+                        post_batch(acquisition_date, [
+                            ('Fixed Assets', cost, 0, f"Acquisition of {asset_name} ({asset_tag})", TxnKind.ASSET_ACQUISITION),
+                            ('Cash', 0, cost, f"Cash payment for {asset_name}", TxnKind.ASSET_ACQUISITION)
+                        ])
                     st.success(f"Fixed asset '{asset_name}' added with tag '{asset_tag}' and posted to GL.")
                 else:
                     st.error("Please fill in all asset details correctly.")
     
     st.subheader("Registered Fixed Assets")
-    if not st.session_state.fixed_assets.empty:
-        st.dataframe(st.session_state.fixed_assets)
+    if store.fixed_asset_rows:
+        st.dataframe(fixed_assets_df())
     else:
         st.info("No fixed assets registered yet.")
     
     st.markdown("---")
     st.subheader("Depreciation Management")
     if st.button("Calculate and Post Annual Depreciation"):
-        status, message = calculate_and_post_depreciation(datetime.now())
+        with store.lock:
+            status, message = calculate_and_post_depreciation(datetime.now())
         if status == 'success':
             st.success(message)
         elif status == 'warning':
             st.warning(message)
 
-elif page == "Point of Sale (POS)":
+def render_pos():
+    """Renders the point of sale form."""
     st.title("Point of Sale (POS)")
     st.write("Record sales transactions and automatically update your inventory.")
 
-    if st.session_state.inventory.empty:
+    if not store.inventory_by_name:
         st.warning("Please add items to the Inventory Management page before making a sale.")
     else:
         with st.form("pos_form", clear_on_submit=True):
             sale_date = st.date_input("Date of Sale", datetime.now())
-            available_items = st.session_state.inventory['Item'].tolist()
+            with store.lock:
+                available_items = list(store.inventory_by_name)
             selected_item = st.selectbox("Select Item", available_items)
             
             # Display item details for user
             if selected_item:
-                item_details = st.session_state.inventory[st.session_state.inventory['Item'] == selected_item].iloc[0]
+                with store.lock:
+                    item_details = dict(store.inventory_by_name[selected_item])
                 st.write(f"**Available Quantity:** {item_details['Quantity']}")
                 st.write(f"**Selling Price:** ${item_details['Selling Price']:.2f}")
 
@@ -644,25 +1196,28 @@ elif page == "Point of Sale (POS)":
             submit_sale = st.form_submit_button("Record Sale")
 
             if submit_sale:
-                status, message = add_sale_record(sale_date, selected_item, sale_quantity, customer_name, sale_type)
+                with store.lock:
+                    status, message = add_sale_record(sale_date, selected_item, sale_quantity, customer_name, sale_type)
                 if status == 'success':
                     st.success(message)
                 else:
                     st.error(message)
 
-elif page == "Financial Statements":
+def render_financial_statements():
+    """Renders the general ledger and financial reports."""
     st.title("Financial Statements")
     st.write("Generate essential financial reports based on your recorded transactions.")
     st.warning("These statements are illustrative and based on a simplified General Ledger. For accurate, auditable reports, a comprehensive accounting system is required.")
 
     with st.expander("View General Ledger (for debugging)", expanded=False):
         st.subheader("Simplified General Ledger Transactions")
-        if not st.session_state.general_ledger.empty:
-            st.dataframe(st.session_state.general_ledger.sort_values(by='Date', ascending=False).reset_index(drop=True))
+        if store.gl['desc']:
+            st.dataframe(gl_df())
         else:
             st.info("No GL entries yet. Add some transactions first.")
     
     st.markdown("---")
+    reports = generate_all_reports() if st.button("Generate All Reports") else {}
     
     col_tb, col_is, col_bs = st.columns(3)
     col_cf, col_sce, _ = st.columns(3)
@@ -670,11 +1225,11 @@ elif page == "Financial Statements":
     with col_tb:
         with st.expander("⚖️ Trial Balance", expanded=True):
             st.write("A summary of all debit and credit balances to ensure equality.")
-            if st.button("Generate Trial Balance"):
-                tb_df = generate_trial_balance()
+            if st.button("Generate Trial Balance") or reports:
+                tb_df = reports['trial_balance'] if reports else generate_trial_balance()
                 if not tb_df.empty:
-                    st.dataframe(tb_df.style.format({'Debit': '{:,.2f}', 'Credit': '{:,.2f}'}), use_container_width=True)
-                    if 'Total' in tb_df.index and abs(tb_df.loc['Total', 'Debit'] - tb_df.loc['Total', 'Credit']) > 0.01:
+                    st.dataframe(tb_df, use_container_width=True, column_config=amount_columns('Debit', 'Credit'))
+                    if 'Total' in tb_df.index and tb_df.loc['Total', 'Debit'] != tb_df.loc['Total', 'Credit']:
                         st.error("🚨 Debits and Credits do NOT balance! (This indicates an issue in GL posting)")
                     else:
                         st.success("✅ Debits and Credits balance!")
@@ -684,23 +1239,24 @@ elif page == "Financial Statements":
     with col_is:
         with st.expander("📈 Comprehensive Income Statement", expanded=True):
             st.write("Summarizes revenues and expenses over a period to show profitability.")
-            if st.button("Generate Income Statement"):
-                is_df = generate_income_statement()
+            if st.button("Generate Income Statement") or reports:
+                is_df = reports['income_statement'] if reports else generate_income_statement()
                 if not is_df.empty:
-                    st.dataframe(is_df.style.format({'Amount': '{:,.2f}'}), use_container_width=True)
+                    st.dataframe(is_df, use_container_width=True, column_config=amount_columns('Amount'))
                 else:
                     st.info("No data to generate Income Statement.")
 
     with col_bs:
         with st.expander("📊 Balance Sheet", expanded=True):
             st.write("A snapshot of assets, liabilities, and equity at a specific point in time.")
-            if st.button("Generate Balance Sheet"):
-                bs_df = generate_balance_sheet()
+            if st.button("Generate Balance Sheet") or reports:
+                bs_df = reports['balance_sheet'] if reports else generate_balance_sheet()
                 if not bs_df.empty:
-                    st.dataframe(bs_df.style.format({'Amount': '{:,.2f}'}), use_container_width=True)
-                    total_assets = bs_df[bs_df['Category'] == 'Total Assets']['Amount'].iloc[0] if 'Total Assets' in bs_df['Category'].values else 0
-                    total_liabilities_equity = bs_df[bs_df['Category'] == 'Total Liabilities & Equity']['Amount'].iloc[0] if 'Total Liabilities & Equity' in bs_df['Category'].values else 0
-                    if abs(total_assets - total_liabilities_equity) > 0.01:
+                    st.dataframe(bs_df, use_container_width=True, column_config=amount_columns('Amount'))
+                    bs_lookup = col_map(bs_df)
+                    total_assets = bs_lookup.get('Total Assets', 0.0)
+                    total_liabilities_equity = bs_lookup.get('Total Liabilities & Equity', 0.0)
+                    if total_assets != total_liabilities_equity:
                         st.error("🚨 Assets do NOT equal Liabilities + Equity! (This indicates an issue)")
                     else:
                         st.success("✅ Assets = Liabilities + Equity!")
@@ -710,24 +1266,97 @@ elif page == "Financial Statements":
     with col_cf:
         with st.expander("💸 Cash Flow Statement", expanded=True):
             st.write("Reports cash inflows and outflows from operating, investing, and financing activities.")
-            if st.button("Generate Cash Flow Statement"):
-                cfs_df = generate_cash_flow_statement()
+            if st.button("Generate Cash Flow Statement") or reports:
+                cfs_df = reports['cash_flow_statement'] if reports else generate_cash_flow_statement()
                 if not cfs_df.empty:
-                    st.dataframe(cfs_df.style.format({'Amount': '{:,.2f}'}), use_container_width=True)
+                    st.dataframe(cfs_df, use_container_width=True, column_config=amount_columns('Amount'))
                 else:
                     st.info("No data to generate Cash Flow Statement.")
 
     with col_sce:
         with st.expander("💰 Statement of Change in Equity", expanded=True):
             st.write("Details the changes in owner's equity over a period.")
-            if st.button("Generate Statement of Change in Equity"):
-                sce_df = generate_statement_of_change_in_equity()
+            if st.button("Generate Statement of Change in Equity") or reports:
+                sce_df = reports['statement_of_change_in_equity'] if reports else generate_statement_of_change_in_equity()
                 if not sce_df.empty:
-                    st.dataframe(sce_df.style.format({'Amount': '{:,.2f}'}), use_container_width=True)
+                    st.dataframe(sce_df, use_container_width=True, column_config=amount_columns('Amount'))
                 else:
                     st.info("No data to generate Statement of Change in Equity.")
 
-elif page == "Analytics":
+@st.fragment
+def _forecasting_fragment(is_totals, bs_totals, metrics):
+    """Renders the forecast section; its widgets rerun only this section."""
+    with st.expander("📈 Forecasting for Years", expanded=True):
+        st.write("Project future financial performance based on assumed growth rates.")
+        st.subheader("Forecasting Assumptions")
+        forecast_years = st.slider("Number of Years to Forecast", 1, 10, 3)
+        revenue_growth_rate = st.slider("Annual Revenue Growth Rate (%)", 0, 30, 5)
+
+        cogs_pct_revenue = metrics['cogs_pct'] if metrics['revenue'] else 40
+        op_exp_pct_revenue = metrics['op_exp_pct'] if metrics['revenue'] else 30
+
+        st.write(f"Assumed COGS as % of Revenue: {cogs_pct_revenue:.2f}%")
+        st.write(f"Assumed Operating Expenses as % of Revenue: {op_exp_pct_revenue:.2f}%")
+
+        if st.button("Run Forecast"):
+            forecasted_is, forecasted_bs = forecast_financials(is_totals, bs_totals, forecast_years, revenue_growth_rate, cogs_pct_revenue, op_exp_pct_revenue)
+            if forecasted_is is not None and not forecasted_is.empty:
+                st.subheader("Forecasted Income Statement")
+                st.dataframe(forecasted_is, use_container_width=True, column_config={**amount_columns(*FORECAST_IS_COLUMNS[1:]), 'Year': st.column_config.NumberColumn(format='%d')})
+                st.subheader("Forecasted Balance Sheet")
+                st.dataframe(forecasted_bs, use_container_width=True, column_config={**amount_columns(*FORECAST_BS_COLUMNS[1:]), 'Year': st.column_config.NumberColumn(format='%d')})
+                st.info("Interpretation: This forecast helps in long-term planning and setting strategic goals.")
+            else:
+                st.warning("Could not generate forecast.")
+
+@st.fragment
+def _scenario_fragment(metrics):
+    """Renders the scenario section; its widgets rerun only this section."""
+    with st.expander("💰 Scenario & Sensitivity Analysis", expanded=True):
+        st.write("Understand the impact of changing key variables on your financial outcomes.")
+        st.subheader("Scenario Parameters")
+        scenario_revenue_growth_impact = st.slider("Change in Revenue Growth (%)", -10, 10, 0)
+        scenario_cogs_impact = st.slider("Change in COGS as % of Revenue (%)", -5, 5, 0)
+        if st.button("Run Scenario Analysis"):
+            base_net_income = metrics['net_income']
+            scenario_revenue = metrics['revenue'] * (1 + scenario_revenue_growth_impact / 100)
+            scenario_cogs_pct = metrics['cogs_pct'] + scenario_cogs_impact
+            scenario_cogs = scenario_revenue * (scenario_cogs_pct / 100)
+            scenario_op_exp = metrics['op_exp']
+            scenario_net_income = scenario_revenue - scenario_cogs - scenario_op_exp
+
+            st.subheader("Scenario Results (Impact on Net Income)")
+            st.write(f"**Base Net Income:** ${base_net_income:,.2f}")
+            st.write(f"**Scenario Net Income:** ${scenario_net_income:,.2f}")
+            if base_net_income != 0:
+                st.metric(label="Change in Net Income", value=f"${scenario_net_income - base_net_income:,.2f}", delta=f"{((scenario_net_income - base_net_income) / base_net_income * 100):.2f}%")
+            else:
+                st.write(f"Change in Net Income: ${scenario_net_income - base_net_income:,.2f}")
+                st.info("Cannot calculate percentage change as Base Net Income is zero.")
+
+def statement_uploader(kind, label):
+    """Renders the uploader for one statement and keeps its frame and totals in session state."""
+    uploaded_file = st.file_uploader(f"Upload {label} (CSV)", type=["csv"], key=f"{kind}_uploader")
+    if uploaded_file is None:
+        return
+    try:
+        loaded = _load_statement(uploaded_file)
+        if loaded is not None:
+            st.session_state[f'uploaded_{kind}'], st.session_state[f'{kind}_totals'] = loaded
+            st.success(f"{label} uploaded successfully!")
+            st.subheader(f"Uploaded {label} Preview:")
+            st.dataframe(st.session_state[f'uploaded_{kind}'])
+        else:
+            st.error(f"Error: {label} CSV must contain 'Item' and 'Amount' columns.")
+            st.session_state[f'uploaded_{kind}'] = None
+            st.session_state[f'{kind}_totals'] = None
+    except Exception as e:
+        st.error(f"Error reading {label} file: {e}")
+        st.session_state[f'uploaded_{kind}'] = None
+        st.session_state[f'{kind}_totals'] = None
+
+def render_analytics():
+    """Renders the analytics for uploaded statements."""
     st.title("Financial Analytics & Insights")
     st.write("Explore key financial metrics, visualize trends, and perform basic modeling.")
     st.header("Upload Financial Statements for Analysis")
@@ -735,55 +1364,20 @@ elif page == "Analytics":
             "Each file **must** have two columns: 'Item' and 'Amount'. "
             "**Ensure there are no extra spaces in column headers.**")
     
-    # Corrected indentation for file uploaders and associated logic
-    uploaded_is_file = st.file_uploader("Upload Income Statement (CSV)", type=["csv"], key="is_uploader")
-    if uploaded_is_file is not None:
-        try:
-            temp_df = pd.read_csv(uploaded_is_file)
-            temp_df.columns = temp_df.columns.str.strip()
-            if 'Item' in temp_df.columns and 'Amount' in temp_df.columns:
-                # Convert 'Amount' column to numeric, coercing errors
-                temp_df['Amount'] = pd.to_numeric(temp_df['Amount'], errors='coerce')
-                st.session_state.uploaded_is = temp_df
-                st.success("Income Statement uploaded successfully!")
-                st.subheader("Uploaded Income Statement Preview:")
-                st.dataframe(st.session_state.uploaded_is)
-            else:
-                st.error("Error: Income Statement CSV must contain 'Item' and 'Amount' columns.")
-                st.session_state.uploaded_is = None
-        except Exception as e:
-            st.error(f"Error reading Income Statement file: {e}")
-            st.session_state.uploaded_is = None
-            
-    uploaded_bs_file = st.file_uploader("Upload Balance Sheet (CSV)", type=["csv"], key="bs_uploader")
-    if uploaded_bs_file is not None:
-        try:
-            temp_df = pd.read_csv(uploaded_bs_file)
-            temp_df.columns = temp_df.columns.str.strip()
-            if 'Item' in temp_df.columns and 'Amount' in temp_df.columns:
-                # Convert 'Amount' column to numeric, coercing errors
-                temp_df['Amount'] = pd.to_numeric(temp_df['Amount'], errors='coerce')
-                st.session_state.uploaded_bs = temp_df
-                st.success("Balance Sheet uploaded successfully!")
-                st.subheader("Uploaded Balance Sheet Preview:")
-                st.dataframe(st.session_state.uploaded_bs)
-            else:
-                st.error("Error: Balance Sheet CSV must contain 'Item' and 'Amount' columns.")
-                st.session_state.uploaded_bs = None
-        except Exception as e:
-            st.error(f"Error reading Balance Sheet file: {e}")
-            st.session_state.uploaded_bs = None
+    statement_uploader('is', "Income Statement")
+    statement_uploader('bs', "Balance Sheet")
 
     st.markdown("---")
     if st.session_state.uploaded_is is not None and st.session_state.uploaded_bs is not None:
-        is_df = st.session_state.uploaded_is
-        bs_df = st.session_state.uploaded_bs
+        is_totals = st.session_state.is_totals
+        bs_totals = st.session_state.bs_totals
+        metrics = base_metrics(is_totals)
         col1, col2 = st.columns(2)
         with col1:
             with st.expander("📊 Financial Ratios", expanded=True):
                 st.write("Analyze key financial performance indicators from your uploaded statements.")
                 if st.button("Calculate Ratios"):
-                    ratios = calculate_ratios(is_df, bs_df)
+                    ratios = calculate_ratios(is_totals, bs_totals)
                     if ratios:
                         for ratio_name, value in ratios.items():
                             if isinstance(value, (int, float)):
@@ -793,86 +1387,55 @@ elif page == "Analytics":
                         st.info("Interpretation: These ratios provide insights into the company's profitability, liquidity, solvency, and efficiency.")
                     else:
                         st.warning("Could not calculate ratios. Please check your uploaded file format and 'Item' names.")
-            with st.expander("📈 Forecasting for Years", expanded=True):
-                st.write("Project future financial performance based on assumed growth rates.")
-                st.subheader("Forecasting Assumptions")
-                forecast_years = st.slider("Number of Years to Forecast", 1, 10, 3)
-                revenue_growth_rate = st.slider("Annual Revenue Growth Rate (%)", 0, 30, 5)
-                
-                current_revenue = is_df[is_df['Item'] == 'Sales Revenue']['Amount'].sum() if 'Sales Revenue' in is_df['Item'].values else 0
-                current_cogs = is_df[is_df['Item'] == 'Cost of Goods Sold']['Amount'].sum() if 'Cost of Goods Sold' in is_df['Item'].values else 0
-                current_op_exp = is_df[is_df['Item'] == 'Operating Expenses']['Amount'].sum() if 'Operating Expenses' in is_df['Item'].values else 0
-                cogs_pct_revenue = (current_cogs / current_revenue * 100) if current_revenue else 40
-                op_exp_pct_revenue = (current_op_exp / current_revenue * 100) if current_revenue else 30
-                
-                st.write(f"Assumed COGS as % of Revenue: {cogs_pct_revenue:.2f}%")
-                st.write(f"Assumed Operating Expenses as % of Revenue: {op_exp_pct_revenue:.2f}%")
-                
-                if st.button("Run Forecast"):
-                    forecasted_is, forecasted_bs = forecast_financials(is_df, bs_df, forecast_years, revenue_growth_rate, cogs_pct_revenue, op_exp_pct_revenue)
-                    if forecasted_is is not None and not forecasted_is.empty:
-                        st.subheader("Forecasted Income Statement")
-                        st.dataframe(forecasted_is.style.format('{:,.2f}'), use_container_width=True)
-                        st.subheader("Forecasted Balance Sheet")
-                        st.dataframe(forecasted_bs.style.format('{:,.2f}'), use_container_width=True)
-                        st.info("Interpretation: This forecast helps in long-term planning and setting strategic goals.")
-                    else:
-                        st.warning("Could not generate forecast.")
+            _forecasting_fragment(is_totals, bs_totals, metrics)
         with col2:
-            with st.expander("💰 Scenario & Sensitivity Analysis", expanded=True):
-                st.write("Understand the impact of changing key variables on your financial outcomes.")
-                st.subheader("Scenario Parameters")
-                scenario_revenue_growth_impact = st.slider("Change in Revenue Growth (%)", -10, 10, 0)
-                scenario_cogs_impact = st.slider("Change in COGS as % of Revenue (%)", -5, 5, 0)
-                if st.button("Run Scenario Analysis"):
-                    base_revenue = is_df[is_df['Item'] == 'Sales Revenue']['Amount'].sum() if 'Sales Revenue' in is_df['Item'].values else 0
-                    base_cogs = is_df[is_df['Item'] == 'Cost of Goods Sold']['Amount'].sum() if 'Cost of Goods Sold' in is_df['Item'].values else 0
-                    base_op_exp = is_df[is_df['Item'] == 'Operating Expenses']['Amount'].sum() if 'Operating Expenses' in is_df['Item'].values else 0
-                    base_net_income = base_revenue - base_cogs - base_op_exp
-
-                    base_cogs_pct = (base_cogs / base_revenue * 100) if base_revenue else 0
-                    scenario_revenue = base_revenue * (1 + scenario_revenue_growth_impact / 100)
-                    scenario_cogs_pct = base_cogs_pct + scenario_cogs_impact
-                    scenario_cogs = scenario_revenue * (scenario_cogs_pct / 100)
-                    scenario_op_exp = base_op_exp
-                    scenario_net_income = scenario_revenue - scenario_cogs - scenario_op_exp
-
-                    st.subheader("Scenario Results (Impact on Net Income)")
-                    st.write(f"**Base Net Income:** ${base_net_income:,.2f}")
-                    st.write(f"**Scenario Net Income:** ${scenario_net_income:,.2f}")
-                    if base_net_income != 0:
-                        st.metric(label="Change in Net Income", value=f"${scenario_net_income - base_net_income:,.2f}", delta=f"{((scenario_net_income - base_net_income) / base_net_income * 100):.2f}%")
-                    else:
-                        st.write(f"Change in Net Income: ${scenario_net_income - base_net_income:,.2f}")
-                        st.info("Cannot calculate percentage change as Base Net Income is zero.")
+            _scenario_fragment(metrics)
             with st.expander("💼 Management Accounting (Conceptual)"):
                 st.write("This section focuses on internal decision-making.")
                 st.subheader("Basic Expense Overview (from GL data)")
-                total_payables = st.session_state.payables['Amount'].sum() if not st.session_state.payables.empty else 0.0
+                expenses_by_vendor = payables_by_vendor()
+                total_payables = expenses_by_vendor.sum() if not expenses_by_vendor.empty else 0.0
                 st.write(f"Total Recorded Expenses: ${total_payables:,.2f}")
-                if not st.session_state.payables.empty:
-                    st.dataframe(st.session_state.payables.groupby('Vendor/Category')['Amount'].sum().sort_values(ascending=False))
+                if not expenses_by_vendor.empty:
+                    st.dataframe(expenses_by_vendor)
                 else:
                     st.info("No payables data for expense overview.")
             with st.expander("📊 Relevant Charts (from GL data)", expanded=True):
                 st.write("Visualizations of your daily records.")
-                if not st.session_state.receivables.empty:
+                if store.receivable_rows:
                     st.subheader("Receivables by Type")
-                    receivables_by_type = st.session_state.receivables.groupby('Type')['Amount'].sum().reset_index()
-                    fig_receivables = px.bar(receivables_by_type, x='Type', y='Amount', title='Total Receivables by Type (Cash vs. Credit)', labels={'Amount': 'Total Amount ($)', 'Type': 'Record Type'})
+                    fig_receivables = _receivables_bar(_agg_rows(receivables_by_type()))
                     st.plotly_chart(fig_receivables, use_container_width=True)
                 else:
                     st.info("No receivables data to chart yet.")
                 st.markdown("---")
-                if not st.session_state.payables.empty:
+                if store.payable_rows:
                     st.subheader("Payables by Category")
-                    payables_by_category = st.session_state.payables.groupby('Vendor/Category')['Amount'].sum().reset_index()
-                    fig_payables = px.pie(payables_by_category, values='Amount', names='Vendor/Category', title='Payables Distribution by Category')
+                    fig_payables = _payables_pie(_agg_rows(payables_by_category()))
                     st.plotly_chart(fig_payables, use_container_width=True)
                 else:
                     st.info("No payables data to chart yet.")
     else:
         st.warning("Please upload both Income Statement and Balance Sheet CSV files to enable advanced analytics.")
 
+PAGES = {
+    "Daily Records (Receivables & Payables)": render_daily_records,
+    "Inventory Management": render_inventory,
+    "Fixed Asset Register": render_fixed_assets,
+    "Point of Sale (POS)": render_pos,
+    "Financial Statements": render_financial_statements,
+    "Analytics": render_analytics
+}
+
+# --- Sidebar Navigation ---
+st.sidebar.title("Navigation")
+page = st.sidebar.radio("Go to", list(PAGES))
+PAGES[page]()
+# Save any records added during this run
+with store.lock:
+    save_state()
+
 st.sidebar.markdown("---")
-st.sidebar.info("This is a basic framework. Data persistence would require integration with a database.")
+st.sidebar.info("This is a basic framework. Records are saved as Parquet files in the 'accounting_data' folder next to the app.")
+for message in store.load_errors:
+    st.sidebar.error(message)